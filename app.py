@@ -1,15 +1,83 @@
 # app.py - REPLACE the STEP file processing section
+import hashlib
+import json
 import tempfile
 import os
+import stat
+from pathlib import Path
 import streamlit as st
 import pandas as pd
 from bom_parser import parse_bom_pdf, clean_bom_data
-from step_parser import parse_step_file, extract_step_components
+from step_parser import extract_step_components
 from matcher import match_components
 
 # Define debug_mode variable
 debug_mode = False  # Set to True to enable debug information
 
+# Parsed STEP components, keyed by the sha256 of the uploaded file.
+# Bump the version whenever component extraction changes.
+STEP_CACHE_DIR = Path(tempfile.gettempdir()) / "bom_cad_step_cache"
+STEP_CACHE_VERSION = 2
+
+def _step_cache_dir():
+    """Return the STEP cache directory, or None if it is not private to this user"""
+    try:
+        STEP_CACHE_DIR.mkdir(mode=0o700, exist_ok=True)
+        info = STEP_CACHE_DIR.lstat()
+    except OSError:
+        return None
+    
+    # Another user could have created it first in the shared temp directory
+    if not stat.S_ISDIR(info.st_mode) or info.st_mode & 0o077:
+        return None
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        return None
+    return STEP_CACHE_DIR
+
+@st.cache_data(max_entries=16)
+def load_step_components(step_bytes: bytes):
+    """Extract STEP components, reusing earlier results for identical files"""
+    digest = hashlib.sha256(step_bytes).hexdigest()
+    cache_dir = _step_cache_dir()
+    cache_path = cache_dir / f"step_v{STEP_CACHE_VERSION}_{digest}.json" if cache_dir else None
+    
+    # JSON rather than pickle: the cache lives in the system temp directory
+    if cache_path:
+        try:
+            cached = json.loads(cache_path.read_text())
+            return cached['components'], cached['entities']
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    # Save STEP file with proper temp file handling for cloud
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.step', mode='w+b') as tmp_step:
+        tmp_step.write(step_bytes)
+        step_path = tmp_step.name
+    
+    try:
+        # Stream STEP entities straight into component extraction
+        step_stats = {}
+        step_components = extract_step_components(step_path, step_stats)
+    finally:
+        # Clean up temp file immediately
+        try:
+            os.unlink(step_path)
+        except OSError:
+            pass
+    
+    # A parse that stopped part-way must not be cached in memory or on disk
+    if 'error' in step_stats:
+        raise ValueError(f"Could not parse STEP file: {step_stats['error']}")
+    
+    entity_count = step_stats.get('entities', 0)
+    if cache_path and entity_count:
+        try:
+            cache_path.write_text(json.dumps({'components': step_components, 'entities': entity_count}))
+        except OSError:
+            pass
+    
+    return step_components, entity_count
+
 def main():
     st.title("BOM to CAD Matcher")
     st.write("Upload your BOM (PDF) and CAD (STEP) files to match components")
@@ -29,35 +97,23 @@ def main():
                 bom_df = parse_bom_pdf(bom_file)
                 bom_df = clean_bom_data(bom_df)
                 
-                # Save STEP file with proper temp file handling for cloud
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.step', mode='w+b') as tmp_step:
-                    # Write bytes for compatibility
-                    if hasattr(step_file, 'getvalue'):
-                        tmp_step.write(step_file.getvalue())
-                    else:
-                        tmp_step.write(step_file.read())
-                    step_path = tmp_step.name
-                
-                # Ensure file is closed before reading
-                tmp_step.close()
-                
-                # Process STEP with explicit file handling
-                step_data = parse_step_file(step_path)
-                step_components = extract_step_components(step_data)
+                # Process STEP, reusing the parse of an identical earlier upload
+                if hasattr(step_file, 'getvalue'):
+                    step_bytes = step_file.getvalue()
+                else:
+                    step_bytes = step_file.read()
+                step_components, step_entity_count = load_step_components(step_bytes)
                 
                 # Match components
                 match_results = match_components(bom_df, step_components)
                 
                 # Display results
                 st.subheader("Matching Results")
-                st.dataframe(match_results)
+                st.dataframe(
+                    match_results,
+                    column_config={'Match_Score': st.column_config.NumberColumn(format='percent')}
+                )
                 
-                # Clean up temp file immediately
-                try:
-                    os.unlink(step_path)
-                except:
-                    pass
-                    
                 # Debug information
                 if debug_mode:
                     st.subheader("Debug Information")
@@ -78,7 +134,7 @@ def main():
                         else:
                             st.write("No components extracted")
                         
-                        st.write(f"STEP entities parsed: {len(step_data)}")
+                        st.write(f"STEP entities parsed: {step_entity_count}")
                 
             except Exception as e:
                 st.error(f"Processing error: {str(e)}")
@@ -2,6 +2,20 @@ import pdfplumber
 import pandas as pd
 import re
 
+try:
+    import pyarrow  # noqa: F401
+    _STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    _STRING_DTYPE = 'string'
+
+# Cells are separated by runs of two or more spaces
+_CELL_SPLIT_RE = re.compile(r'\s{2,}')
+
+# Cleaning patterns for BOM text columns
+_PART_NUMBER_JUNK_RE = re.compile(r'[^\w\-_/]')
+_LINE_BREAK_RE = re.compile(r'[\r\n]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 def parse_bom_pdf(pdf_file) -> pd.DataFrame:
     """Improved PDF parser with better table detection"""
     with pdfplumber.open(pdf_file) as pdf:
@@ -15,7 +29,7 @@ def parse_bom_pdf(pdf_file) -> pd.DataFrame:
                 table = []
                 for line in lines:
                     # Split on multiple spaces but preserve part numbers with spaces
-                    cells = re.split(r'\s{2,}', line)
+                    cells = _CELL_SPLIT_RE.split(line)
                     table.append(cells)
                 if table:
                     tables.extend(table)
@@ -45,28 +59,28 @@ def clean_bom_data(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     
     # Clean part numbers
-    df['PartNumber'] = df['PartNumber'].astype(str).apply(_clean_part_number)
+    part_num = df['PartNumber'].astype('string').fillna('').str.upper().str.strip()
+    # Remove common PDF artifacts and collapse multiple spaces
+    part_num = part_num.str.replace(_PART_NUMBER_JUNK_RE, ' ', regex=True)
+    df['PartNumber'] = part_num.str.replace(_WHITESPACE_RE, ' ', regex=True).str.strip()
     
     # Clean descriptions
-    df['Description'] = df['Description'].astype(str).apply(_clean_description)
+    desc = df['Description'].astype('string').fillna('').str.upper().str.strip()
+    # Remove line breaks and extra spaces
+    desc = desc.str.replace(_LINE_BREAK_RE, ' ', regex=True)
+    df['Description'] = desc.str.replace(_WHITESPACE_RE, ' ', regex=True).str.strip()
     
     # Remove empty rows
     df = df[(df['PartNumber'] != '') | (df['Description'] != '')]
     
-    return df
-
-def _clean_part_number(part_num: str) -> str:
-    """Specialized part number cleaning"""
-    part_num = part_num.upper().strip()
-    # Remove common PDF artifacts
-    part_num = re.sub(r'[^\w\-_/]', ' ', part_num)
-    part_num = ' '.join(part_num.split())  # Collapse multiple spaces
-    return part_num
+    # Store the text columns compactly
+    return df.assign(
+        PartNumber=_compact_text(df['PartNumber']),
+        Description=_compact_text(df['Description'])
+    )
 
-def _clean_description(desc: str) -> str:
-    """Specialized description cleaning"""
-    desc = desc.upper().strip()
-    # Remove line breaks and extra spaces
-    desc = desc.replace('\n', ' ').replace('\r', ' ')
-    desc = ' '.join(desc.split())
-    return desc
\ No newline at end of file
+def _compact_text(s: pd.Series) -> pd.Series:
+    """Use a categorical for heavily repeated text, Arrow-backed strings otherwise"""
+    if len(s) and s.nunique() / len(s) < 0.5:
+        return s.astype('category')
+    return s.astype(_STRING_DTYPE)
@@ -1,45 +1,88 @@
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process, utils
+import ahocorasick
+import numpy as np
 import pandas as pd
 from typing import List, Dict
 import re
 
-def match_components(bom_df: pd.DataFrame, step_components: List[Dict]) -> pd.DataFrame:
-    """Enhanced matching with fuzzy logic and better scoring"""
-    # Pre-process BOM data
+# Raw fuzzy scores (0-100) below this are weak matches and count as zero,
+# which lets rapidfuzz skip pairs that cannot reach it
+_SCORE_CUTOFF = 60
+
+# Scores are whole percentages in uint8 until the final Match_Score column.
+# Description scores are down-weighted through lookup tables that round
+# down, so a weighted score only reaches a match-type threshold (60/80/95)
+# when the unrounded weighted score does.
+_PARTIAL_WEIGHT = ((np.arange(101) * 7) // 10).astype(np.uint8)  # x 0.7
+_TOKEN_WEIGHT = ((np.arange(101) * 6) // 10).astype(np.uint8)    # x 0.6
+_CONTAINS_SCORE = np.uint8(80)
+_NO_SCORE = np.uint8(0)
+
+def match_components(bom_df: pd.DataFrame, step_components: List[Dict],
+                     workers: int = -1) -> pd.DataFrame:
+    """Enhanced matching with fuzzy logic and better scoring
+    
+    ``workers`` is the number of threads used for fuzzy scoring; -1 uses
+    every available core.
+    """
+    # Pre-process BOM data; repeated rows collapse to one result anyway
     bom_df = _preprocess_bom(bom_df)
+    bom_df = bom_df.drop_duplicates(subset=['PartNumber', 'Description'])
     
     # Pre-process STEP components
     step_data = _preprocess_step(step_components)
     
-    matches = []
+    step_pn = step_data['part_number']
+    step_desc = step_data['description']
     
-    for _, bom_row in bom_df.iterrows():
-        best_match = None
-        best_score = 0.0  # Initialize with default value
-        
-        for step_comp in step_data:
-            # Multi-criteria matching
-            score = _calculate_enhanced_score(bom_row, step_comp)
-            
-            if score > best_score:
-                best_score = score
-                best_match = step_comp
-        
-        # Ensure best_score is always a valid number
-        if best_match is None:
-            best_score = 0.0
-        
-        matches.append({
-            'BOM_PartNumber': bom_row['PartNumber'],
-            'BOM_Description': bom_row['Description'],
-            'STEP_PartNumber': best_match['part_number'] if best_match else None,
-            'STEP_Description': best_match['description'] if best_match else None,
-            'Match_Score': float(best_score) if best_match else 0.0,
-            'Match_Type': _get_match_type(best_score) if best_match and best_score is not None else 'No Match'
-        })
+    # Work on plain arrays from here on
+    bom_pn = bom_df['PartNumber'].to_numpy(dtype=object)
+    bom_desc = bom_df['Description'].to_numpy(dtype=object)
+    
+    best_idx = np.zeros(len(bom_df), dtype=np.intp)
+    best_scores = np.zeros(len(bom_df), dtype=np.uint8)
+    
+    # Exact part number matches are perfect scores, so skip fuzzy scoring for them
+    exact_map = {}
+    for j, part_num in enumerate(step_pn):
+        if part_num:
+            exact_map.setdefault(part_num, j)
+    
+    exact_idx = np.array([exact_map.get(part_num, -1) for part_num in bom_pn], dtype=np.intp)
+    is_exact = exact_idx >= 0
+    best_idx[is_exact] = exact_idx[is_exact]
+    best_scores[is_exact] = 100
+    
+    # Score the remaining BOM rows against every STEP component in one batch
+    is_fuzzy = ~is_exact
+    combined = _score_matrix(
+        bom_pn[is_fuzzy],
+        bom_desc[is_fuzzy],
+        step_pn,
+        step_desc,
+        workers
+    )
+    
+    if combined.shape[1]:
+        best_idx[is_fuzzy] = combined.argmax(axis=1)
+        best_scores[is_fuzzy] = combined.max(axis=1)
+    
+    # A zero score means no STEP component matched at all
+    matched = best_scores > 0
+    match_types = _get_match_types(best_scores)
+    match_types[~matched] = 'No Match'
+    
+    matches = pd.DataFrame({
+        'BOM_PartNumber': bom_pn,
+        'BOM_Description': bom_desc,
+        'STEP_PartNumber': _take_matched(step_pn, best_idx, matched),
+        'STEP_Description': _take_matched(step_desc, best_idx, matched),
+        'Match_Score': best_scores.astype(np.float32) / np.float32(100),
+        'Match_Type': match_types
+    })
     
     # Post-process results
-    return _post_process_matches(pd.DataFrame(matches))
+    return _post_process_matches(matches)
 
 def _preprocess_bom(df: pd.DataFrame) -> pd.DataFrame:
     """Clean and standardize BOM data"""
@@ -60,72 +103,100 @@ def _preprocess_bom(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
-def _preprocess_step(components: List[Dict]) -> List[Dict]:
-    """Clean and standardize STEP components"""
-    processed = []
-    for comp in components:
-        clean_comp = comp.copy()
-        clean_comp['part_number'] = str(comp.get('part_number', '')).upper().strip()
-        clean_comp['description'] = str(comp.get('description', '')).upper().strip()
-        processed.append(clean_comp)
-    return processed
+def _preprocess_step(components: List[Dict]) -> Dict[str, np.ndarray]:
+    """Clean and standardize STEP components into column arrays"""
+    return {
+        'part_number': np.array([str(c.get('part_number', '')).upper().strip() for c in components], dtype=object),
+        'description': np.array([str(c.get('description', '')).upper().strip() for c in components], dtype=object),
+        'id': np.array([c.get('id') for c in components], dtype=object),
+        'type': np.array([c.get('type') for c in components], dtype=object)
+    }
 
-def _calculate_enhanced_score(bom_row, step_comp) -> float:
-    """Advanced scoring using multiple matching strategies"""
-    try:
-        scores = []
-        
-        # 1. Exact part number match
-        if bom_row['PartNumber'] and step_comp['part_number']:
-            if bom_row['PartNumber'] == step_comp['part_number']:
-                return 1.0  # Perfect match
-        
-        # 2. Fuzzy part number matching
-        if bom_row['PartNumber'] and step_comp['part_number']:
-            try:
-                scores.append(fuzz.ratio(bom_row['PartNumber'], step_comp['part_number']) / 100)
-            except:
-                pass
-        
-        # 3. Description contains part number
-        if bom_row['PartNumber'] and step_comp['description']:
-            if bom_row['PartNumber'] in step_comp['description']:
-                scores.append(0.8)
-        
-        # 4. Fuzzy description matching
-        if bom_row['Description'] and step_comp['description']:
-            try:
-                scores.append(fuzz.partial_ratio(bom_row['Description'], step_comp['description']) / 100 * 0.7)
-            except:
-                pass
-        
-        # 5. Token set ratio for descriptions
-        if bom_row['Description'] and step_comp['description']:
-            try:
-                scores.append(fuzz.token_set_ratio(bom_row['Description'], step_comp['description']) / 100 * 0.6)
-            except:
-                pass
-        
-        return max(scores) if scores else 0.0
-    except Exception as e:
-        print(f"Error calculating score: {e}")
-        return 0.0
+def _score_matrix(bom_parts: np.ndarray, bom_descs: np.ndarray,
+                  step_parts: np.ndarray, step_descs: np.ndarray,
+                  workers: int = -1) -> np.ndarray:
+    """Advanced scoring using multiple matching strategies, as an N x M matrix
+    
+    Scores are uint8 percentages. Exact part number matches are resolved by
+    the caller before scoring.
+    """
+    n, m = len(bom_parts), len(step_parts)
+    if not n or not m:
+        return np.zeros((n, m), dtype=np.uint8)
+    
+    has_pn = (bom_parts != '')[:, None] & (step_parts != '')[None, :]
+    has_desc = (bom_descs != '')[:, None] & (step_descs != '')[None, :]
+    
+    # 1. Fuzzy part number matching
+    score_pn = _cdist_unique(bom_parts, step_parts, fuzz.ratio, workers)
+    
+    # 2. Description contains part number
+    contains = _contains_matrix(bom_parts, step_descs)
+    
+    # 3. Fuzzy description matching
+    score_partial = _cdist_unique(bom_descs, step_descs, fuzz.partial_ratio, workers)
+    
+    # 4. Token set ratio for descriptions, on lowercased text with punctuation
+    # turned into spaces (what fuzzywuzzy's token_set_ratio did by default)
+    score_token = _cdist_unique(bom_descs, step_descs, fuzz.token_set_ratio, workers,
+                                processor=utils.default_process)
+    
+    combined = np.maximum.reduce([
+        np.where(has_pn, score_pn, _NO_SCORE),
+        np.where(contains, _CONTAINS_SCORE, _NO_SCORE),
+        np.where(has_desc, _PARTIAL_WEIGHT[score_partial], _NO_SCORE),
+        np.where(has_desc, _TOKEN_WEIGHT[score_token], _NO_SCORE),
+    ])
+    
+    return combined
 
-def _get_match_type(score: float) -> str:
-    """Classify match quality"""
-    try:
-        if score is None:
-            return 'No Match'
-        score = float(score)
-        if score >= 0.95:
-            return 'Exact Match'
-        elif score >= 0.8:
-            return 'Strong Match'
-        elif score >= 0.6:
-            return 'Partial Match'
-        return 'Weak/No Match'
-    except (ValueError, TypeError):
-        return 'No Match'
+def _cdist_unique(queries, choices, scorer, workers: int = -1, processor=None) -> np.ndarray:
+    """Score only the distinct strings on each side, then expand to the full matrix"""
+    unique_q, inverse_q = np.unique(np.asarray(queries, dtype=object), return_inverse=True)
+    unique_c, inverse_c = np.unique(np.asarray(choices, dtype=object), return_inverse=True)
+    
+    scores = process.cdist(unique_q, unique_c, scorer=scorer, processor=processor,
+                           score_cutoff=_SCORE_CUTOFF, workers=workers, dtype=np.uint8)
+    return scores[np.ix_(inverse_q.ravel(), inverse_c.ravel())]
+
+def _contains_matrix(bom_parts: np.ndarray, step_descs: np.ndarray) -> np.ndarray:
+    """Flag every (BOM row, STEP component) pair whose description contains the part number"""
+    contains = np.zeros((len(bom_parts), len(step_descs)), dtype=bool)
+    
+    # Several BOM rows can share a part number
+    rows_by_part = {}
+    for i, part_num in enumerate(bom_parts):
+        if part_num:
+            rows_by_part.setdefault(part_num, []).append(i)
+    
+    if not rows_by_part:
+        return contains
+    
+    # One Aho-Corasick pass per description finds every part number it contains
+    automaton = ahocorasick.Automaton()
+    for part_num, rows in rows_by_part.items():
+        automaton.add_word(part_num, rows)
+    automaton.make_automaton()
+    
+    for j, desc in enumerate(step_descs):
+        for _, rows in automaton.iter(desc):
+            contains[rows, j] = True
+    
+    return contains
+
+def _take_matched(values: np.ndarray, idx: np.ndarray, matched: np.ndarray) -> np.ndarray:
+    """Pick values[idx] for matched rows, None everywhere else"""
+    out = np.full(len(idx), None, dtype=object)
+    out[matched] = values[idx[matched]]
+    return out
+
+def _get_match_types(scores: np.ndarray) -> np.ndarray:
+    """Classify match quality from whole-percentage scores"""
+    return np.select(
+        [scores >= 95, scores >= 80, scores >= 60],
+        ['Exact Match', 'Strong Match', 'Partial Match'],
+        default='Weak/No Match'
+    ).astype(object)
 
 def _post_process_matches(df: pd.DataFrame) -> pd.DataFrame:
     """Clean up and filter results"""
@@ -143,20 +214,9 @@ def _post_process_matches(df: pd.DataFrame) -> pd.DataFrame:
         # Convert Match_Score to numeric, handling any invalid values
         df['Match_Score'] = pd.to_numeric(df['Match_Score'], errors='coerce').fillna(0.0)
         
-        # Sort by match score
+        # Sort by match score; scores stay numeric and are formatted for display
         df = df.sort_values('Match_Score', ascending=False)
         
-        # Format scores as percentages - with proper error handling
-        def format_score(score):
-            try:
-                if pd.isna(score) or score is None:
-                    return "0%"
-                return f"{float(score):.0%}"
-            except (ValueError, TypeError):
-                return "0%"
-        
-        df['Match_Score'] = df['Match_Score'].apply(format_score)
-        
         return df
     except Exception as e:
         print(f"Error in post-processing: {e}")
@@ -13,6 +13,12 @@ def generate_pdf_report(match_results, output_path):
     styles = getSampleStyleSheet()
     elements.append(Paragraph("BOM to CAD Matching Report", styles['Title']))
     
+    # Show numeric match scores as percentages
+    if 'Match_Score' in match_results.columns:
+        match_results = match_results.assign(
+            Match_Score=match_results['Match_Score'].map('{:.0%}'.format)
+        )
+    
     # Convert DataFrame to list of lists for ReportLab
     data = [match_results.columns.tolist()] + match_results.values.tolist()
     
@@ -1,69 +1,173 @@
 # step_parser.py - COMPLETE REPLACEMENT
+import mmap
+import multiprocessing
+import os
 import re
-from typing import List, Dict
+import sys
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
-def parse_step_file(file_path: str) -> List[Dict]:
-    """Robust STEP file parser for cloud environments"""
+# Files at least this large are parsed in parallel chunks of about
+# _CHUNK_BYTES each, with at most _CHUNKS_IN_FLIGHT chunks per worker
+# queued or parsed but not yet consumed
+_PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+_CHUNK_BYTES = 4 * 1024 * 1024
+_CHUNKS_IN_FLIGHT = 2
+
+# Basic components are built from at most this many leading entities
+# when no real component is found (limit to avoid overload)
+_FALLBACK_ENTITIES = 50
+
+# Standard entity instance: #<id> = <definition>;
+_ENTITY_RE = re.compile(rb'#(\d+)\s*=\s*([^;]*);', re.DOTALL)
+
+# Entity type (first word) and its parameter block
+_TYPE_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)')
+_PARAM_BLOCK_RE = re.compile(r'\((.*)\)', re.DOTALL)
+
+# Parameter list tokens: quoted strings (an unterminated quote runs to the end),
+# brackets, commas and runs of anything else
+_PARAM_TOKEN_RE = re.compile(r"'[^']*'|'.*|[()\[\],]|[^'()\[\],]+", re.DOTALL)
+_OPEN_TOKENS = ('(', '[')
+_CLOSE_TOKENS = (')', ']')
+
+# Scalar parameter values
+_TRUE_VALUES = frozenset(['.T.', 'TRUE', 'T'])
+_FALSE_VALUES = frozenset(['.F.', 'FALSE', 'F'])
+_INT_RE = re.compile(r'[-+]?\d+')
+_REAL_RE = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+# Common part number patterns
+_PART_NUMBER_RES = [
+    re.compile(r'^[A-Z0-9\-_/.]+$'),  # Alphanumeric with symbols
+    re.compile(r'^[0-9\-]+[A-Z]?$'),   # Numbers with dashes and optional letter
+    re.compile(r'^[A-Z]{2,}\d+'),      # Letters followed by numbers
+]
+
+# Geometry, topology and presentation entities, which make up the bulk of a
+# STEP file but never describe a component
+_GEOMETRY_TYPES = frozenset([
+    'CARTESIAN_POINT', 'DIRECTION', 'VECTOR',
+    'AXIS1_PLACEMENT', 'AXIS2_PLACEMENT_2D', 'AXIS2_PLACEMENT_3D',
+    'LINE', 'CIRCLE', 'ELLIPSE', 'POLYLINE', 'TRIMMED_CURVE',
+    'B_SPLINE_CURVE', 'B_SPLINE_CURVE_WITH_KNOTS', 'RATIONAL_B_SPLINE_CURVE',
+    'B_SPLINE_SURFACE', 'B_SPLINE_SURFACE_WITH_KNOTS', 'RATIONAL_B_SPLINE_SURFACE',
+    'PLANE', 'CYLINDRICAL_SURFACE', 'CONICAL_SURFACE', 'SPHERICAL_SURFACE',
+    'TOROIDAL_SURFACE', 'SURFACE_OF_REVOLUTION', 'SURFACE_OF_LINEAR_EXTRUSION',
+    'PCURVE', 'SURFACE_CURVE', 'SEAM_CURVE', 'DEFINITIONAL_REPRESENTATION',
+    'VERTEX_POINT', 'EDGE_CURVE', 'ORIENTED_EDGE', 'EDGE_LOOP', 'VERTEX_LOOP',
+    'FACE_BOUND', 'FACE_OUTER_BOUND', 'ADVANCED_FACE', 'FACE_SURFACE',
+    'CLOSED_SHELL', 'OPEN_SHELL', 'ORIENTED_CLOSED_SHELL',
+    'COLOUR_RGB', 'STYLED_ITEM', 'OVER_RIDING_STYLED_ITEM',
+    'PRESENTATION_STYLE_ASSIGNMENT', 'SURFACE_STYLE_USAGE', 'SURFACE_SIDE_STYLE',
+    'SURFACE_STYLE_FILL_AREA', 'FILL_AREA_STYLE', 'FILL_AREA_STYLE_COLOUR',
+    'CURVE_STYLE', 'DRAUGHTING_PRE_DEFINED_CURVE_FONT',
+])
+
+def iter_step_entities(file_path: str, processes: Optional[int] = None,
+                       stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """Robust STEP file parser for cloud environments, yielding one entity at a time
+    
+    Files of at least ``_PARALLEL_MIN_BYTES`` are split into chunks that are
+    parsed by a pool of ``processes`` workers (default: one per usable CPU). Errors
+    are logged and end the stream early; if ``stats`` is given, the error
+    message is also stored under ``'error'``.
+    """
+    entity_count = 0
     try:
-        # Read with multiple encoding attempts
-        content = None
-        encodings = ['utf-8', 'iso-8859-1', 'cp1252']
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                    content = f.read()
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if content is None:
-            # Fallback: binary read with replacement
-            with open(file_path, 'rb') as f:
-                content = f.read().decode('utf-8', errors='replace')
-        
-        # Normalize line endings and remove BOM if present
-        content = content.replace('\r\n', '\n').replace('\r', '\n')
-        content = content.lstrip('\ufeff')
+        # Empty files cannot be memory-mapped
+        size = os.path.getsize(file_path)
+        if size == 0:
+            logger.info("Parsed 0 entities from STEP file")
+            return
         
-        entities = []
+        processes = processes or _usable_cpus()
         
-        # Multiple parsing strategies
-        patterns = [
-            r'#(\d+)\s*=\s*([^;]*);',  # Standard format
-            r'(\#\d+\s*=\s*[^;]*;)',   # Alternative format
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, content, re.DOTALL | re.MULTILINE)
-            for match in matches:
-                if pattern == r'#(\d+)\s*=\s*([^;]*);':
-                    entity_id, entity_def = match.groups()
-                else:
-                    full_match = match.group(1)
-                    entity_id_match = re.search(r'#(\d+)', full_match)
-                    if entity_id_match:
-                        entity_id = entity_id_match.group(1)
-                        entity_def = full_match.replace(f"#{entity_id} =", "").strip(' ;')
-                    else:
+        if size >= _PARALLEL_MIN_BYTES and processes > 1:
+            chunk_count = max(processes, -(-size // _CHUNK_BYTES))
+            chunks = _chunk_bounds(file_path, size, chunk_count)
+            # Spawn rather than fork: the caller (e.g. a Streamlit script thread)
+            # may run in a multi-threaded process, where forking can deadlock
+            with multiprocessing.get_context('spawn').Pool(min(processes, len(chunks))) as pool:
+                # Bound the parsed-but-unconsumed chunks held in this process
+                pending = deque()
+                for start, end in chunks:
+                    pending.append(pool.apply_async(_parse_chunk, ((file_path, start, end),)))
+                    if len(pending) < processes * _CHUNKS_IN_FLIGHT:
                         continue
-                
-                entity = _parse_entity(entity_id.strip(), entity_def.strip())
-                if entity:
-                    entities.append(entity)
-            
-            if entities:  # Stop if we found entities
-                break
+                    for entity in pending.popleft().get():
+                        entity_count += 1
+                        yield entity
+                while pending:
+                    for entity in pending.popleft().get():
+                        entity_count += 1
+                        yield entity
+        else:
+            # Scan the file through a read-only memory map instead of loading it
+            with open(file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for entity in _iter_entities(mm, 0, size):
+                    entity_count += 1
+                    yield entity
         
-        logger.info(f"Parsed {len(entities)} entities from STEP file")
-        return entities
+        logger.info(f"Parsed {entity_count} entities from STEP file")
         
     except Exception as e:
         logger.error(f"Error parsing STEP file {file_path}: {e}")
-        return []
+        if stats is not None:
+            stats['error'] = str(e)
+
+def _usable_cpus() -> int:
+    """Number of CPUs this process may run on (respects CPU affinity)"""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _iter_entities(mm: mmap.mmap, start: int, end: int) -> Iterator[Dict]:
+    """Parse the entities that lie between two byte offsets of a mapped file"""
+    for match in _ENTITY_RE.finditer(mm, start, end):
+        # Only the matched slices are decoded; invalid bytes are replaced
+        entity_id = match.group(1).decode('utf-8', 'replace')
+        entity_def = match.group(2).decode('utf-8', 'replace')
+        entity_def = entity_def.replace('\r\n', '\n').replace('\r', '\n')
+        
+        entity = _parse_entity(entity_id, entity_def.strip())
+        if entity:
+            yield entity
+
+def _chunk_bounds(file_path: str, size: int, count: int) -> List[Tuple[int, int]]:
+    """Split a file into roughly equal byte ranges that each end just after a ';'
+    
+    An entity match never contains a ';' before its final one, so no entity
+    can straddle two ranges.
+    """
+    bounds = []
+    with open(file_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        for k in range(1, count):
+            split = mm.find(b';', max(start, size * k // count))
+            if split < 0:
+                break
+            bounds.append((start, split + 1))
+            start = split + 1
+    bounds.append((start, size))
+    return bounds
+
+def _parse_chunk(chunk: Tuple[str, int, int]) -> List[Dict]:
+    """Pool worker: parse one byte range of a STEP file"""
+    file_path, start, end = chunk
+    with open(file_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return list(_iter_entities(mm, start, end))
+
+def parse_step_file(file_path: str) -> List[Dict]:
+    """Parse a whole STEP file into a list of entities"""
+    return list(iter_step_entities(file_path))
 
 def _parse_entity(entity_id: str, entity_def: str) -> Dict:
     """Parse individual STEP entity with robust error handling"""
@@ -72,15 +176,16 @@ def _parse_entity(entity_id: str, entity_def: str) -> Dict:
             return None
             
         # Extract entity type (first word)
-        type_match = re.match(r'^([A-Za-z_][A-Za-z0-9_]*)', entity_def)
+        type_match = _TYPE_RE.match(entity_def)
         if not type_match:
             return None
             
-        entity_type = type_match.group(1).upper()
+        # Entity types come from a small schema, so intern them
+        entity_type = sys.intern(type_match.group(1).upper())
         
         # Extract parameters
         parameters = []
-        param_match = re.search(r'\((.*)\)', entity_def, re.DOTALL)
+        param_match = _PARAM_BLOCK_RE.search(entity_def)
         
         if param_match:
             param_str = param_match.group(1)
@@ -105,30 +210,25 @@ def _parse_parameters(param_str: str) -> list:
     try:
         # Split on commas outside of quotes and nested structures
         params = []
-        current = ""
+        current = []
         depth = 0
-        in_quotes = False
         
-        for char in param_str:
-            if char == "'" and not in_quotes:
-                in_quotes = True
-            elif char == "'" and in_quotes:
-                in_quotes = False
-                
-            if not in_quotes:
-                if char in '([':
-                    depth += 1
-                elif char in ')]':
-                    depth -= 1
-                elif char == ',' and depth == 0:
-                    params.append(current.strip())
-                    current = ""
-                    continue
-                    
-            current += char
+        for token in _PARAM_TOKEN_RE.findall(param_str):
+            if token == ',' and depth == 0:
+                params.append(''.join(current).strip())
+                current = []
+                continue
+            
+            if token in _OPEN_TOKENS:
+                depth += 1
+            elif token in _CLOSE_TOKENS:
+                depth -= 1
+            
+            current.append(token)
         
-        if current.strip():
-            params.append(current.strip())
+        last = ''.join(current).strip()
+        if last:
+            params.append(last)
             
         return [_clean_param(p) for p in params]
         
@@ -139,45 +239,67 @@ def _parse_parameters(param_str: str) -> list:
 def _clean_param(param: str):
     """Clean parameter value"""
     param = param.strip()
+    first = param[:1]
     
     # Remove quotes
-    if (param.startswith("'") and param.endswith("'")) or (param.startswith('"') and param.endswith('"')):
-        return param[1:-1]
+    if first == "'" or first == '"':
+        return param[1:-1] if param.endswith(first) else param
     
     # Handle references
-    if param.startswith("#"):
+    if first == '#':
         return f"REF:{param[1:].strip()}"
     
     # Handle boolean values
-    if param.upper() in ['.T.', 'TRUE', 'T']:
-        return True
-    if param.upper() in ['.F.', 'FALSE', 'F']:
-        return False
+    if len(param) <= 5:
+        upper = param.upper()
+        if upper in _TRUE_VALUES:
+            return True
+        if upper in _FALSE_VALUES:
+            return False
     
     # Handle numbers
-    try:
-        if '.' in param:
-            return float(param)
-        else:
-            return int(param)
-    except (ValueError, TypeError):
-        pass
+    if _INT_RE.fullmatch(param):
+        return int(param)
+    if _REAL_RE.fullmatch(param):
+        return float(param)
     
     return param
 
-def extract_step_components(step_data: List[Dict]) -> List[Dict]:
-    """Extract components with better cloud compatibility"""
+def extract_step_components(step_data: Union[str, Iterable[Dict]],
+                            stats: Optional[Dict] = None) -> List[Dict]:
+    """Extract components with better cloud compatibility
+    
+    ``step_data`` is either a STEP file path, which is streamed entity by
+    entity, or already parsed entities. If ``stats`` is given, the number of
+    entities scanned is stored under ``'entities'``, and a parse error on a
+    file path under ``'error'``.
+    """
     components = []
+    entity_count = 0
+    # Kept for the fallback below, so the input is only consumed once
+    first_entities = []
+    
+    if isinstance(step_data, (str, os.PathLike)):
+        step_data = iter_step_entities(step_data, stats=stats)
     
     # Look for common patterns in STEP files
     for entity in step_data:
+        entity_count += 1
+        if len(first_entities) < _FALLBACK_ENTITIES:
+            first_entities.append(entity)
+        # Geometry and styling entities never carry component data
+        if entity['type'] in _GEOMETRY_TYPES:
+            continue
         comp_data = _extract_from_entity(entity)
         if comp_data:
             components.append(comp_data)
     
+    if stats is not None:
+        stats['entities'] = entity_count
+    
     # If no components found, create basic ones from entities with data
     if not components:
-        for entity in step_data[:50]:  # Limit to first 50 to avoid overload
+        for entity in first_entities:
             comp_data = _create_basic_component(entity)
             if comp_data:
                 components.append(comp_data)
@@ -199,6 +321,13 @@ def _extract_from_entity(entity: Dict) -> Dict:
             # Check if it looks like a description
             elif _looks_like_description(param):
                 description = param
+            
+            # Stop once both are found. The part number kept is the last one
+            # seen before the first description (or the last overall if there
+            # is no description); later parameters, e.g. 'ABC-100-REV-B' after
+            # the description, are not considered
+            if part_number and description:
+                break
     
     if part_number or description:
         return {
@@ -230,18 +359,7 @@ def _looks_like_part_number(text: str) -> bool:
     if not text or len(text) < 4:
         return False
     
-    # Common part number patterns
-    patterns = [
-        r'^[A-Z0-9\-_/.]+$',  # Alphanumeric with symbols
-        r'^[0-9\-]+[A-Z]?$',   # Numbers with dashes and optional letter
-        r'^[A-Z]{2,}\d+',      # Letters followed by numbers
-    ]
-    
-    for pattern in patterns:
-        if re.match(pattern, text):
-            return True
-    
-    return False
+    return any(pattern.match(text) for pattern in _PART_NUMBER_RES)
 
 def _looks_like_description(text: str) -> bool:
     """Heuristic to identify descriptions"""
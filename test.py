@@ -1,5 +1,6 @@
 from step_parser import parse_step_file, extract_step_components
 
-data = parse_step_file("test.step")
-components = extract_step_components(data)
-print(components)
\ No newline at end of file
+if __name__ == "__main__":
+    data = parse_step_file("test.step")
+    components = extract_step_components(data)
+    print(components)